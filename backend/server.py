@@ -1,24 +1,34 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, Query, BackgroundTasks
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, Query, BackgroundTasks, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
 import os
+import time
+import asyncio
 import logging
+import functools
+import re
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from pydantic import BaseModel, Field, EmailStr, ConfigDict
-from typing import List, Optional, Dict, Any
-import uuid
+from typing import List, Optional, Dict, Any, AsyncIterator
+import uuid_utils
 from datetime import datetime, timezone, timedelta
 import jwt
 import bcrypt
-from cryptography.fernet import Fernet
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
+from cryptography.fernet import Fernet, MultiFernet
 import aiosmtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from email.message import EmailMessage
 import base64
 import secrets
 import aiofiles
+import orjson
+from cachetools import TTLCache
 from bson import ObjectId
 
 ROOT_DIR = Path(__file__).parent
@@ -26,7 +36,14 @@ load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=50,
+    minPoolSize=10,  # kept warm so the first requests don't pay for connection setup
+    maxConnecting=4,  # caps concurrent handshakes to avoid connection storms under load
+    serverSelectionTimeoutMS=3000,
+    compressors="zstd,zlib"
+)
 db = client[os.environ['DB_NAME']]
 
 # Upload directory
@@ -38,12 +55,36 @@ JWT_SECRET = os.environ.get('JWT_SECRET', secrets.token_hex(32))
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 
+# Public frontend URL, used for links in emails sent outside a request (e.g. verification).
+# Verification emails are skipped while it is unset, since their links would be relative.
+FRONTEND_URL = os.environ.get('FRONTEND_URL', '').rstrip('/')
+
+# Password hashing: Argon2id with the OWASP baseline profile. Hashes created before the
+# migration are bcrypt ("$2b$...") and are still accepted, then upgraded on next login.
+password_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+# Dedicated threads for hashing so a login burst can't starve the default executor
+# (each Argon2 hash holds ~19 MiB, which also bounds peak memory)
+password_executor = ThreadPoolExecutor(
+    max_workers=min(8, (os.cpu_count() or 1) * 2),
+    thread_name_prefix="password-hash"
+)
+
 # Encryption key for storing sensitive credentials
 ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY', Fernet.generate_key().decode())
-cipher_suite = Fernet(ENCRYPTION_KEY.encode() if isinstance(ENCRYPTION_KEY, str) else ENCRYPTION_KEY)
+# Comma-separated keys allow rotation: the first key encrypts, every key can decrypt
+_KEY_BYTES = ENCRYPTION_KEY.encode() if isinstance(ENCRYPTION_KEY, str) else ENCRYPTION_KEY
+cipher_suite = MultiFernet([Fernet(key.strip()) for key in _KEY_BYTES.split(b",") if key.strip()])
+
+def json_dumps(content: Any) -> bytes:
+    """orjson encoding; raw Mongo docs are projected without _id, so unknown types are a bug and raise"""
+    return orjson.dumps(content, option=orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS)
+
+class KyberJSONResponse(ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
 
 # Create the main app
-app = FastAPI(title="KyberBusiness API")
+app = FastAPI(title="KyberBusiness API", default_response_class=KyberJSONResponse)
 api_router = APIRouter(prefix="/api")
 security = HTTPBearer()
 
@@ -219,17 +260,35 @@ class RoleUpdate(BaseModel):
 
 # ==================== HELPER FUNCTIONS ====================
 
-def encrypt_data(data: str) -> str:
-    return cipher_suite.encrypt(data.encode()).decode()
+def encrypt_data(data: str, _encrypt=cipher_suite.encrypt) -> str:
+    return _encrypt(data.encode()).decode()
+
+# Stored secrets (PayPal client id, SMTP password) are decrypted on every public invoice
+# view or send; ciphertexts are unique per write, so stale entries simply stop being hit
+@functools.lru_cache(maxsize=256)
+def decrypt_data(encrypted_data: str, _decrypt=cipher_suite.decrypt) -> str:
+    return _decrypt(encrypted_data.encode()).decode()
 
-def decrypt_data(encrypted_data: str) -> str:
-    return cipher_suite.decrypt(encrypted_data.encode()).decode()
+def _is_bcrypt_hash(hashed: str) -> bool:
+    return hashed.startswith("$2")
+
+def _verify_password_sync(password: str, hashed: str) -> bool:
+    if _is_bcrypt_hash(hashed):
+        return bcrypt.checkpw(password.encode(), hashed.encode())
+    try:
+        return password_hasher.verify(hashed, password)
+    except (VerificationError, InvalidHashError):
+        return False
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+def password_needs_rehash(hashed: str) -> bool:
+    return _is_bcrypt_hash(hashed) or password_hasher.check_needs_rehash(hashed)
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode(), hashed.encode())
+# Hashing is deliberately slow, so it runs off the event loop to keep other requests moving
+async def hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(password_executor, password_hasher.hash, password)
+
+async def verify_password(password: str, hashed: str) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(password_executor, _verify_password_sync, password, hashed)
 
 def create_token(user_id: str, email: str, role: str) -> str:
     payload = {
@@ -240,6 +299,14 @@ def create_token(user_id: str, email: str, role: str) -> str:
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
+# Authenticated users keyed by id. Short TTL bounds staleness for changes made by other
+# workers; writes in this process evict the entry directly via invalidate_user_cache().
+# No lock needed: lookups and stores never straddle an await.
+user_cache: TTLCache = TTLCache(maxsize=10_000, ttl=30)
+
+def invalidate_user_cache(user_id: str):
+    user_cache.pop(user_id, None)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         if not credentials or not credentials.credentials:
@@ -248,9 +315,12 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         user_id = payload.get("sub")
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token")
-        user = await db.users.find_one({"id": user_id}, {"_id": 0})
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
+        user = user_cache.get(user_id)
+        if user is None:
+            user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0, "verification_token": 0})
+            if not user:
+                raise HTTPException(status_code=401, detail="User not found")
+            user_cache[user_id] = user
         return user
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
@@ -267,40 +337,248 @@ async def require_accountant_or_admin(user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Accountant or Admin access required")
     return user
 
+async def stream_json_array(cursor) -> AsyncIterator[bytes]:
+    """Encode a Motor cursor as a JSON array one document at a time"""
+    yield b"["
+    separator = b""
+    async for doc in cursor:
+        yield separator + json_dumps(doc)
+        separator = b","
+    yield b"]"
+
+def json_array_response(cursor) -> StreamingResponse:
+    return StreamingResponse(stream_json_array(cursor), media_type="application/json")
+
+def new_id() -> str:
+    # UUIDv7 is time-ordered, so inserts land at the right edge of the unique id indexes
+    # instead of splitting random B-tree pages; same dashed string format as before
+    return str(uuid_utils.uuid7())
+
+# (UTC epoch day, "YYYYMMDD") - the date part of document numbers only changes at midnight
+_number_date = (-1, "")
+
 def generate_number(prefix: str) -> str:
-    return f"{prefix}-{datetime.now(timezone.utc).strftime('%Y%m%d')}-{secrets.token_hex(4).upper()}"
+    global _number_date
+    day = int(time.time()) // 86400
+    if day != _number_date[0]:
+        _number_date = (day, datetime.now(timezone.utc).strftime('%Y%m%d'))
+    # Random rather than a per-process counter so numbers stay unique across workers
+    return f"{prefix}-{_number_date[1]}-{os.urandom(4).hex().upper()}"
 
 def calculate_totals(items: List[Dict[str, Any]]) -> tuple:
-    subtotal = sum(item.get("quantity", 1) * item.get("price", 0) for item in items)
+    # Plain loop: no generator frame per item, and the sum stays a local
+    subtotal = 0
+    for item in items:
+        subtotal += item.get("quantity", 1) * item.get("price", 0)
     tax = subtotal * 0.1  # 10% tax
-    total = subtotal + tax
-    return subtotal, tax, total
+    return subtotal, tax, subtotal + tax
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Leading bytes of each accepted image format
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"<?xml", "image/svg+xml"),
+    (b"<svg", "image/svg+xml"),
+)
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Image type from the file's first bytes; the client-sent content type can't be trusted"""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    head = head.lstrip(b"\xef\xbb\xbf \t\r\n")  # SVG may start with a BOM or whitespace
+    for signature, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return None
+
+async def save_upload(file: UploadFile, filepath: Path, allowed_types: List[str], max_bytes: int, too_large_detail: str):
+    """Stream an upload to disk a chunk at a time, rejecting it once it passes max_bytes.
+    
+    The first chunk is sniffed before anything touches the disk. Data goes to a temporary
+    file that only replaces `filepath` when complete, so a rejected or interrupted upload
+    never leaves a partial file behind.
+    """
+    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+    if sniff_image_type(chunk[:64]) not in allowed_types:
+        raise HTTPException(status_code=415, detail="File content is not an allowed image type")
+    
+    tmp_path = filepath.with_name(filepath.name + ".part")
+    size = 0
+    try:
+        async with aiofiles.open(tmp_path, "wb") as f:
+            while chunk:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=too_large_detail)
+                await f.write(chunk)
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, filepath)
+
+# Settings `data` by type (None when the type isn't configured). Settings only change through
+# the admin save endpoints, which evict their entry; the TTL bounds staleness on other workers.
+# Cached dicts are shared between requests and must not be mutated.
+settings_cache: TTLCache = TTLCache(maxsize=16, ttl=30)
+_NOT_CACHED = object()
+
+def invalidate_setting(type_: str):
+    settings_cache.pop(type_, None)
+
+async def fetch_settings(*types: str) -> Dict[str, Dict[str, Any]]:
+    """Several settings as {type: data}, with one query for whatever isn't cached; missing types are absent"""
+    settings = {}
+    missing = []
+    for type_ in types:
+        data = settings_cache.get(type_, _NOT_CACHED)
+        if data is _NOT_CACHED:
+            missing.append(type_)
+        elif data is not None:
+            settings[type_] = data
+    if missing:
+        cursor = db.settings.find({"type": {"$in": missing}}, {"_id": 0})
+        found = {doc["type"]: doc.get("data", {}) async for doc in cursor}
+        for type_ in missing:
+            settings_cache[type_] = found.get(type_)
+        settings.update(found)
+    return settings
+
+async def get_setting(type_: str) -> Optional[Dict[str, Any]]:
+    return (await fetch_settings(type_)).get(type_)
+
+async def write_setting(type_: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Upsert a settings document and return its stored data, refreshing this worker's cache"""
+    settings = await db.settings.find_one_and_update(
+        {"type": type_},
+        {"$set": {"type": type_, "data": data}},
+        projection={"_id": 0, "data": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    settings_cache[type_] = settings["data"]
+    return settings["data"]
+
+async def get_smtp_config() -> Optional[Dict[str, Any]]:
+    """SMTP settings with the password already decrypted, or None if not configured"""
+    data = await get_setting("smtp")
+    if data is None:
+        return None
+    smtp_config = dict(data)
+    if smtp_config.get("password"):
+        smtp_config["password"] = decrypt_data(smtp_config["password"])
+    return smtp_config
+
+class SmtpPool:
+    """Long-lived, authenticated SMTP sessions keyed by server config.
+    
+    Reusing a session skips the TCP/TLS handshake, EHLO and AUTH on every send. SMTP is
+    stateful, so a session is checked out by one send at a time; up to `size` sends per
+    server run in parallel on separate sessions. A session the server dropped while idle
+    is reopened once and the send retried; a session that fails otherwise is discarded.
+    """
+    
+    def __init__(self, size: int = 4):
+        self._size = size
+        self._idle: Dict[tuple, List[aiosmtplib.SMTP]] = {}
+        self._slots: Dict[tuple, asyncio.Semaphore] = {}
+    
+    @staticmethod
+    def _key(smtp_config: Dict[str, Any]) -> tuple:
+        return (
+            smtp_config.get("host"),
+            smtp_config.get("port"),
+            smtp_config.get("username"),
+            smtp_config.get("password"),
+            smtp_config.get("use_tls", True)
+        )
+    
+    @staticmethod
+    async def _connect(smtp_config: Dict[str, Any]) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=smtp_config.get("host"),
+            port=smtp_config.get("port"),
+            username=smtp_config.get("username"),
+            password=smtp_config.get("password"),
+            use_tls=smtp_config.get("use_tls", True)
+        )
+        await smtp.connect()
+        return smtp
+    
+    async def send_message(self, smtp_config: Dict[str, Any], message: EmailMessage):
+        key = self._key(smtp_config)
+        slots = self._slots.setdefault(key, asyncio.Semaphore(self._size))
+        async with slots:
+            idle = self._idle.setdefault(key, [])
+            smtp = idle.pop() if idle else None
+            if smtp is None or not smtp.is_connected:
+                smtp = await self._connect(smtp_config)
+            try:
+                try:
+                    await smtp.send_message(message)
+                except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPTimeoutError):
+                    smtp.close()
+                    smtp = await self._connect(smtp_config)
+                    await smtp.send_message(message)
+            except BaseException:
+                smtp.close()
+                raise
+            # Return the session unless the pool was closed while this send was in flight
+            if self._idle.get(key) is idle:
+                idle.append(smtp)
+            else:
+                smtp.close()
+    
+    async def close(self):
+        sessions = [smtp for idle in self._idle.values() for smtp in idle]
+        self._idle.clear()
+        for smtp in sessions:
+            try:
+                await smtp.quit()
+            except aiosmtplib.SMTPException:
+                smtp.close()
+
+smtp_pool = SmtpPool()
 
 async def send_email(to_email: str, subject: str, body_html: str):
-    settings = await db.settings.find_one({"type": "smtp"}, {"_id": 0})
-    if not settings:
+    smtp_config = await get_smtp_config()
+    if not smtp_config:
         raise HTTPException(status_code=400, detail="SMTP not configured")
     
     try:
-        smtp_config = settings.get("data", {})
-        message = MIMEMultipart("alternative")
+        message = EmailMessage()
         message["From"] = f"{smtp_config.get('from_name', 'KyberBusiness')} <{smtp_config.get('from_email')}>"
         message["To"] = to_email
         message["Subject"] = subject
-        message.attach(MIMEText(body_html, "html"))
+        message.set_content(body_html, subtype="html")
         
-        await aiosmtplib.send(
-            message,
-            hostname=smtp_config.get("host"),
-            port=smtp_config.get("port"),
-            username=smtp_config.get("username"),
-            password=decrypt_data(smtp_config.get("password")),
-            use_tls=smtp_config.get("use_tls", True)
-        )
+        await smtp_pool.send_message(smtp_config, message)
     except Exception as e:
         logging.error(f"Failed to send email: {e}")
         raise HTTPException(status_code=500, detail="Failed to send email")
 
+async def send_verification_email(email: str, token: str):
+    """Background task: runs after the response, so failures are logged rather than raised"""
+    if not FRONTEND_URL:
+        logging.warning(f"FRONTEND_URL is not set; verification email to {email} not sent")
+        return
+    link = f"{FRONTEND_URL}/verify-email?token={token}"
+    body = f"""
+<div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+    <h2 style="color: #333;">Verify your email</h2>
+    <p style="color: #666;">Confirm your KyberBusiness account by opening the link below.</p>
+    <p><a href="{link}" style="color: #06b6d4;">{link}</a></p>
+</div>
+"""
+    try:
+        await send_email(email, "Verify your KyberBusiness account", body)
+    except HTTPException as e:
+        logging.warning(f"Verification email to {email} not sent: {e.detail}")
+
 # ==================== AUTH ROUTES ====================
 
 @api_router.post("/auth/register", response_model=TokenResponse)
@@ -313,14 +591,14 @@ async def register(data: UserCreate, background_tasks: BackgroundTasks):
     is_admin = data.email.endswith("@thestarforge.org")
     role = UserRole.ADMIN if is_admin else UserRole.VIEWER
     
-    user_id = str(uuid.uuid4())
+    user_id = new_id()
     verification_token = secrets.token_urlsafe(32)
     
     user_doc = {
         "id": user_id,
         "email": data.email,
         "name": data.name,
-        "password": hash_password(data.password),
+        "password": await hash_password(data.password),
         "role": role,
         "email_verified": False,
         "verification_token": verification_token,
@@ -329,8 +607,8 @@ async def register(data: UserCreate, background_tasks: BackgroundTasks):
     
     await db.users.insert_one(user_doc)
     
-    # Queue verification email
-    # background_tasks.add_task(send_verification_email, data.email, verification_token)
+    # Sent after the response so registration doesn't wait on the SMTP round trip
+    background_tasks.add_task(send_verification_email, data.email, verification_token)
     
     token = create_token(user_id, data.email, role)
     
@@ -349,9 +627,16 @@ async def register(data: UserCreate, background_tasks: BackgroundTasks):
 @api_router.post("/auth/login", response_model=TokenResponse)
 async def login(data: UserLogin):
     user = await db.users.find_one({"email": data.email}, {"_id": 0})
-    if not user or not verify_password(data.password, user["password"]):
+    if not user or not await verify_password(data.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    # Transparently migrate legacy bcrypt hashes (or outdated Argon2 parameters)
+    if password_needs_rehash(user["password"]):
+        await db.users.update_one(
+            {"id": user["id"]},
+            {"$set": {"password": await hash_password(data.password)}}
+        )
+    
     token = create_token(user["id"], user["email"], user["role"])
     
     return TokenResponse(
@@ -368,14 +653,18 @@ async def login(data: UserLogin):
 
 @api_router.post("/auth/verify-email")
 async def verify_email(token: str = Query(...)):
-    user = await db.users.find_one({"verification_token": token})
+    # The token stays until a new one is issued, so opening the link again (or a repeated
+    # request) reports success instead of an invalid token; the pre-update doc tells them apart
+    user = await db.users.find_one_and_update(
+        {"verification_token": token},
+        {"$set": {"email_verified": True}},
+        projection={"_id": 0, "id": 1, "email_verified": 1}
+    )
     if not user:
         raise HTTPException(status_code=400, detail="Invalid verification token")
-    
-    await db.users.update_one(
-        {"id": user["id"]},
-        {"$set": {"email_verified": True}, "$unset": {"verification_token": ""}}
-    )
+    if user.get("email_verified"):
+        return {"message": "Email already verified"}
+    invalidate_user_cache(user["id"])
     
     return {"message": "Email verified successfully"}
 
@@ -390,7 +679,7 @@ async def resend_verification(background_tasks: BackgroundTasks, user: dict = De
         {"$set": {"verification_token": verification_token}}
     )
     
-    # background_tasks.add_task(send_verification_email, user["email"], verification_token)
+    background_tasks.add_task(send_verification_email, user["email"], verification_token)
     return {"message": "Verification email sent"}
 
 @api_router.get("/auth/me", response_model=UserResponse)
@@ -406,17 +695,22 @@ async def get_me(user: dict = Depends(get_current_user)):
 
 # ==================== ADMIN ROUTES ====================
 
-@api_router.get("/admin/users", response_model=List[UserResponse])
-async def list_users(admin: dict = Depends(require_admin)):
-    users = await db.users.find({}, {"_id": 0, "password": 0, "verification_token": 0}).to_list(1000)
-    return [UserResponse(
-        id=u["id"],
-        email=u["email"],
-        name=u["name"],
-        role=u["role"],
-        email_verified=u.get("email_verified", False),
-        created_at=u["created_at"]
-    ) for u in users]
+# Only the fields exposed by UserResponse; never ship password hashes or verification tokens
+USER_LIST_PROJECTION = {"_id": 0, "id": 1, "email": 1, "name": 1, "role": 1, "email_verified": 1, "created_at": 1}
+
+# List endpoints page by keyset: pass the created_at of the last item received as `after`.
+# Read paths return trusted docs straight from Mongo without per-row model validation (the
+# bulk of the response cost); `responses=` keeps the schema in the OpenAPI docs.
+
+@api_router.get("/admin/users", responses={200: {"model": List[UserResponse]}})
+async def list_users(
+    limit: int = Query(1000, ge=1, le=1000),
+    after: Optional[str] = None,
+    admin: dict = Depends(require_admin)
+):
+    query = {"created_at": {"$gt": after}} if after else {}
+    cursor = db.users.find(query, USER_LIST_PROJECTION).sort("created_at", 1).limit(limit).batch_size(200)
+    return json_array_response(cursor)
 
 @api_router.put("/admin/users/{user_id}/role")
 async def update_user_role(user_id: str, data: RoleUpdate, admin: dict = Depends(require_admin)):
@@ -426,6 +720,7 @@ async def update_user_role(user_id: str, data: RoleUpdate, admin: dict = Depends
     result = await db.users.update_one({"id": user_id}, {"$set": {"role": data.role}})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user_cache(user_id)
     
     return {"message": "Role updated successfully"}
 
@@ -437,18 +732,23 @@ async def delete_user(user_id: str, admin: dict = Depends(require_admin)):
     result = await db.users.delete_one({"id": user_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user_cache(user_id)
     
     return {"message": "User deleted successfully"}
 
 # ==================== QUOTES ROUTES ====================
 
-@api_router.post("/quotes", response_model=QuoteResponse)
-async def create_quote(data: QuoteCreate, user: dict = Depends(require_accountant_or_admin)):
+# Most quotes/invoices one bulk create may insert
+BULK_CREATE_LIMIT = 100
+
+def check_bulk_size(items: list):
+    if not 1 <= len(items) <= BULK_CREATE_LIMIT:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {BULK_CREATE_LIMIT} items")
+
+def build_quote_doc(data: QuoteCreate, user: dict) -> dict:
     subtotal, tax, total = calculate_totals(data.items)
-    quote_id = str(uuid.uuid4())
-    
-    quote_doc = {
-        "id": quote_id,
+    return {
+        "id": new_id(),
         "quote_number": generate_number("QT"),
         "client_name": data.client_name,
         "client_email": data.client_email,
@@ -463,22 +763,39 @@ async def create_quote(data: QuoteCreate, user: dict = Depends(require_accountan
         "created_at": datetime.now(timezone.utc).isoformat(),
         "created_by": user["id"]
     }
-    
+
+@api_router.post("/quotes", response_model=QuoteResponse)
+async def create_quote(data: QuoteCreate, user: dict = Depends(require_accountant_or_admin)):
+    quote_doc = build_quote_doc(data, user)
     await db.quotes.insert_one(quote_doc)
     
     return QuoteResponse(**{k: v for k, v in quote_doc.items() if k != "_id"})
 
-@api_router.get("/quotes", response_model=List[QuoteResponse])
-async def list_quotes(user: dict = Depends(get_current_user)):
-    quotes = await db.quotes.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return [QuoteResponse(**q) for q in quotes]
+@api_router.post("/quotes/bulk", response_model=List[QuoteResponse])
+async def create_quotes_bulk(data: List[QuoteCreate], user: dict = Depends(require_accountant_or_admin)):
+    """Create several quotes in one request and one insert"""
+    check_bulk_size(data)
+    quote_docs = [build_quote_doc(item, user) for item in data]
+    await db.quotes.insert_many(quote_docs)
+    
+    return [QuoteResponse(**{k: v for k, v in doc.items() if k != "_id"}) for doc in quote_docs]
 
-@api_router.get("/quotes/{quote_id}", response_model=QuoteResponse)
+@api_router.get("/quotes", responses={200: {"model": List[QuoteResponse]}})
+async def list_quotes(
+    limit: int = Query(1000, ge=1, le=1000),
+    after: Optional[str] = None,
+    user: dict = Depends(get_current_user)
+):
+    query = {"created_at": {"$lt": after}} if after else {}
+    cursor = db.quotes.find(query, {"_id": 0}).sort("created_at", -1).limit(limit).batch_size(200)
+    return json_array_response(cursor)
+
+@api_router.get("/quotes/{quote_id}", responses={200: {"model": QuoteResponse}})
 async def get_quote(quote_id: str, user: dict = Depends(get_current_user)):
     quote = await db.quotes.find_one({"id": quote_id}, {"_id": 0})
     if not quote:
         raise HTTPException(status_code=404, detail="Quote not found")
-    return QuoteResponse(**quote)
+    return KyberJSONResponse(quote)
 
 @api_router.put("/quotes/{quote_id}", response_model=QuoteResponse)
 async def update_quote(quote_id: str, data: QuoteCreate, user: dict = Depends(require_accountant_or_admin)):
@@ -497,11 +814,14 @@ async def update_quote(quote_id: str, data: QuoteCreate, user: dict = Depends(re
         "status": data.status
     }
     
-    result = await db.quotes.update_one({"id": quote_id}, {"$set": update_doc})
-    if result.matched_count == 0:
+    quote = await db.quotes.find_one_and_update(
+        {"id": quote_id},
+        {"$set": update_doc},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not quote:
         raise HTTPException(status_code=404, detail="Quote not found")
-    
-    quote = await db.quotes.find_one({"id": quote_id}, {"_id": 0})
     return QuoteResponse(**quote)
 
 @api_router.delete("/quotes/{quote_id}")
@@ -513,11 +833,16 @@ async def delete_quote(quote_id: str, user: dict = Depends(require_accountant_or
 
 @api_router.post("/quotes/{quote_id}/convert-to-invoice", response_model=InvoiceResponse)
 async def convert_quote_to_invoice(quote_id: str, user: dict = Depends(require_accountant_or_admin)):
-    quote = await db.quotes.find_one({"id": quote_id}, {"_id": 0})
+    # Mark the quote converted and read it back in the same round trip
+    quote = await db.quotes.find_one_and_update(
+        {"id": quote_id},
+        {"$set": {"status": "converted"}},
+        projection={"_id": 0}
+    )
     if not quote:
         raise HTTPException(status_code=404, detail="Quote not found")
     
-    invoice_id = str(uuid.uuid4())
+    invoice_id = new_id()
     invoice_doc = {
         "id": invoice_id,
         "invoice_number": generate_number("INV"),
@@ -537,19 +862,15 @@ async def convert_quote_to_invoice(quote_id: str, user: dict = Depends(require_a
     }
     
     await db.invoices.insert_one(invoice_doc)
-    await db.quotes.update_one({"id": quote_id}, {"$set": {"status": "converted"}})
     
     return InvoiceResponse(**{k: v for k, v in invoice_doc.items() if k != "_id"})
 
 # ==================== INVOICES ROUTES ====================
 
-@api_router.post("/invoices", response_model=InvoiceResponse)
-async def create_invoice(data: InvoiceCreate, user: dict = Depends(require_accountant_or_admin)):
+def build_invoice_doc(data: InvoiceCreate, user: dict) -> dict:
     subtotal, tax, total = calculate_totals(data.items)
-    invoice_id = str(uuid.uuid4())
-    
-    invoice_doc = {
-        "id": invoice_id,
+    return {
+        "id": new_id(),
         "invoice_number": generate_number("INV"),
         "client_name": data.client_name,
         "client_email": data.client_email,
@@ -565,22 +886,39 @@ async def create_invoice(data: InvoiceCreate, user: dict = Depends(require_accou
         "created_at": datetime.now(timezone.utc).isoformat(),
         "created_by": user["id"]
     }
-    
+
+@api_router.post("/invoices", response_model=InvoiceResponse)
+async def create_invoice(data: InvoiceCreate, user: dict = Depends(require_accountant_or_admin)):
+    invoice_doc = build_invoice_doc(data, user)
     await db.invoices.insert_one(invoice_doc)
     
     return InvoiceResponse(**{k: v for k, v in invoice_doc.items() if k != "_id"})
 
-@api_router.get("/invoices", response_model=List[InvoiceResponse])
-async def list_invoices(user: dict = Depends(get_current_user)):
-    invoices = await db.invoices.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return [InvoiceResponse(**inv) for inv in invoices]
+@api_router.post("/invoices/bulk", response_model=List[InvoiceResponse])
+async def create_invoices_bulk(data: List[InvoiceCreate], user: dict = Depends(require_accountant_or_admin)):
+    """Create several invoices in one request and one insert"""
+    check_bulk_size(data)
+    invoice_docs = [build_invoice_doc(item, user) for item in data]
+    await db.invoices.insert_many(invoice_docs)
+    
+    return [InvoiceResponse(**{k: v for k, v in doc.items() if k != "_id"}) for doc in invoice_docs]
+
+@api_router.get("/invoices", responses={200: {"model": List[InvoiceResponse]}})
+async def list_invoices(
+    limit: int = Query(1000, ge=1, le=1000),
+    after: Optional[str] = None,
+    user: dict = Depends(get_current_user)
+):
+    query = {"created_at": {"$lt": after}} if after else {}
+    cursor = db.invoices.find(query, {"_id": 0}).sort("created_at", -1).limit(limit).batch_size(200)
+    return json_array_response(cursor)
 
-@api_router.get("/invoices/{invoice_id}", response_model=InvoiceResponse)
+@api_router.get("/invoices/{invoice_id}", responses={200: {"model": InvoiceResponse}})
 async def get_invoice(invoice_id: str, user: dict = Depends(get_current_user)):
     invoice = await db.invoices.find_one({"id": invoice_id}, {"_id": 0})
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
-    return InvoiceResponse(**invoice)
+    return KyberJSONResponse(invoice)
 
 @api_router.put("/invoices/{invoice_id}", response_model=InvoiceResponse)
 async def update_invoice(invoice_id: str, data: InvoiceCreate, user: dict = Depends(require_accountant_or_admin)):
@@ -599,18 +937,26 @@ async def update_invoice(invoice_id: str, data: InvoiceCreate, user: dict = Depe
         "status": data.status
     }
     
-    result = await db.invoices.update_one({"id": invoice_id}, {"$set": update_doc})
-    if result.matched_count == 0:
+    before = await db.invoices.find_one_and_update(
+        {"id": invoice_id},
+        {"$set": update_doc},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
+    if not before:
         raise HTTPException(status_code=404, detail="Invoice not found")
-    
-    invoice = await db.invoices.find_one({"id": invoice_id}, {"_id": 0})
+    invoice = {**before, **update_doc}
+    await rollup_invoice_change(before, invoice)
     return InvoiceResponse(**invoice)
 
 @api_router.delete("/invoices/{invoice_id}")
 async def delete_invoice(invoice_id: str, user: dict = Depends(require_accountant_or_admin)):
-    result = await db.invoices.delete_one({"id": invoice_id})
-    if result.deleted_count == 0:
+    invoice = await db.invoices.find_one_and_delete(
+        {"id": invoice_id}, projection={"_id": 0, "status": 1, "paid_at": 1, "total": 1}
+    )
+    if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
+    await rollup_invoice_change(invoice, None)
     return {"message": "Invoice deleted successfully"}
 
 # Public invoice view (no auth required)
@@ -621,10 +967,10 @@ async def get_public_invoice(invoice_id: str):
         raise HTTPException(status_code=404, detail="Invoice not found")
     
     # Get PayPal settings for payment button
-    paypal_settings = await db.settings.find_one({"type": "paypal"}, {"_id": 0})
+    paypal_settings = await get_setting("paypal")
     paypal_client_id = None
-    if paypal_settings and paypal_settings.get("data", {}).get("client_id"):
-        paypal_client_id = decrypt_data(paypal_settings["data"]["client_id"])
+    if paypal_settings and paypal_settings.get("client_id"):
+        paypal_client_id = decrypt_data(paypal_settings["client_id"])
     
     return {
         **invoice,
@@ -633,95 +979,163 @@ async def get_public_invoice(invoice_id: str):
 
 @api_router.post("/public/invoices/{invoice_id}/mark-paid")
 async def mark_invoice_paid(invoice_id: str, payment_id: str = Query(...)):
-    result = await db.invoices.update_one(
+    paid = {"status": "paid", "payment_id": payment_id, "paid_at": datetime.now(timezone.utc).isoformat()}
+    before = await db.invoices.find_one_and_update(
         {"id": invoice_id},
-        {"$set": {"status": "paid", "payment_id": payment_id, "paid_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": paid},
+        projection={"_id": 0, "status": 1, "paid_at": 1, "total": 1},
+        return_document=ReturnDocument.BEFORE
     )
-    if result.matched_count == 0:
+    if not before:
         raise HTTPException(status_code=404, detail="Invoice not found")
+    await rollup_invoice_change(before, {**before, **paid})
     return {"message": "Invoice marked as paid"}
 
+# Placeholders understood in email template subjects and bodies, replaced in a single regex
+# pass. str.format can't be used: admin-written templates may contain literal CSS braces.
+EMAIL_PLACEHOLDER_RE = re.compile(r"\{(invoice_number|total|due_date|payment_link)\}")
+
+def render_email_template(text: str, values: Dict[str, str]) -> str:
+    return EMAIL_PLACEHOLDER_RE.sub(lambda m: values[m.group(1)], text)
+
+# Used when no email templates exist at all
+FALLBACK_INVOICE_EMAIL_HTML = """
+<div style="font-family: Georgia, serif; max-width: 600px; margin: 0 auto; padding: 40px; background: #ffffff; border: 1px solid #e0e0e0;">
+    <h1 style="color: #333; border-bottom: 2px solid #06b6d4; padding-bottom: 10px;">INVOICE</h1>
+    <p style="color: #666;">Invoice Number: <strong>#{invoice_number}</strong></p>
+    <p style="color: #666;">Amount Due: <strong>${total}</strong></p>
+    <p style="color: #666;">Due Date: <strong>{due_date}</strong></p>
+    <div style="margin: 30px 0;">
+        <a href="{payment_link}" style="background: #06b6d4; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px;">Pay Now</a>
+    </div>
+    <p style="color: #999; font-size: 12px;">Thank you for your business.</p>
+</div>
+"""
+
 class SendInvoiceRequest(BaseModel):
     frontend_url: str  # The frontend URL for generating payment link
+    background: bool = False  # Queue for the email worker and return 202 immediately
+
+async def deliver_invoice_email(invoice: dict, subject: str, body: str):
+    """Send an invoice email and mark a draft invoice as sent"""
+    await send_email(invoice["client_email"], subject, body)
+    
+    # Update invoice status to sent if it was draft
+    if invoice["status"] == "draft":
+        await db.invoices.update_one({"id": invoice["id"]}, {"$set": {"status": "sent"}})
+
+async def deliver_invoice_email_task(invoice: dict, subject: str, body: str):
+    try:
+        await deliver_invoice_email(invoice, subject, body)
+    except HTTPException as e:
+        logging.warning(f"Invoice {invoice['id']} email not sent: {e.detail}")
+
+# Queued invoice emails as (invoice, subject, body), drained by email_worker. In memory only:
+# jobs still queued when the process stops are not sent.
+email_queue: asyncio.Queue = asyncio.Queue()
+EMAIL_BATCH_SIZE = 16
+
+async def email_worker():
+    """Drain the email queue, sending whatever has piled up as one concurrent batch"""
+    while True:
+        batch = [await email_queue.get()]
+        while len(batch) < EMAIL_BATCH_SIZE and not email_queue.empty():
+            batch.append(email_queue.get_nowait())
+        # The SMTP pool spreads the batch over its sessions; one failure doesn't stop the rest
+        results = await asyncio.gather(*(deliver_invoice_email_task(*job) for job in batch), return_exceptions=True)
+        for job, result in zip(batch, results):
+            if isinstance(result, Exception):
+                logging.error(f"Invoice {job[0]['id']} email failed: {result}")
+            email_queue.task_done()
 
 @api_router.post("/invoices/{invoice_id}/send")
 async def send_invoice_email(invoice_id: str, data: SendInvoiceRequest, user: dict = Depends(require_accountant_or_admin)):
     """Send invoice email to client with payment link"""
-    invoice = await db.invoices.find_one({"id": invoice_id}, {"_id": 0})
+    # Independent reads run concurrently; settings come back in one query and stay cached
+    # for send_email's SMTP lookup
+    invoice, settings, template = await asyncio.gather(
+        db.invoices.find_one({"id": invoice_id}, {"_id": 0}),
+        fetch_settings("branding", "smtp"),
+        db.email_templates.find_one({"is_default": True}, {"_id": 0})
+    )
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
     
-    # Get branding settings
-    branding = await db.settings.find_one({"type": "branding"}, {"_id": 0})
-    company_name = branding.get("data", {}).get("company_name", "KyberBusiness") if branding else "KyberBusiness"
+    company_name = settings.get("branding", {}).get("company_name", "KyberBusiness")
     
-    # Get default email template
-    template = await db.email_templates.find_one({"is_default": True}, {"_id": 0})
+    # Fall back when there is no default email template
     if not template:
         # Use first template or default
         templates = await db.email_templates.find({}, {"_id": 0}).to_list(1)
         template = templates[0] if templates else {
             "subject": "Invoice #{invoice_number} from " + company_name,
-            "body_html": """
-<div style="font-family: Georgia, serif; max-width: 600px; margin: 0 auto; padding: 40px; background: #ffffff; border: 1px solid #e0e0e0;">
-    <h1 style="color: #333; border-bottom: 2px solid #06b6d4; padding-bottom: 10px;">INVOICE</h1>
-    <p style="color: #666;">Invoice Number: <strong>#{invoice_number}</strong></p>
-    <p style="color: #666;">Amount Due: <strong>${total}</strong></p>
-    <p style="color: #666;">Due Date: <strong>{due_date}</strong></p>
-    <div style="margin: 30px 0;">
-        <a href="{payment_link}" style="background: #06b6d4; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px;">Pay Now</a>
-    </div>
-    <p style="color: #999; font-size: 12px;">Thank you for your business.</p>
-</div>
-            """
+            "body_html": FALLBACK_INVOICE_EMAIL_HTML
         }
     
     # Build payment link
     payment_link = f"{data.frontend_url}/pay/{invoice_id}"
     
     # Format the email
-    subject = template["subject"].replace("{invoice_number}", invoice["invoice_number"])
-    body = template["body_html"]
-    body = body.replace("{invoice_number}", invoice["invoice_number"])
-    body = body.replace("#{invoice_number}", invoice["invoice_number"])
-    body = body.replace("{total}", f"{invoice['total']:.2f}")
-    body = body.replace("${total}", f"${invoice['total']:.2f}")
-    body = body.replace("{due_date}", invoice.get("due_date") or "Upon Receipt")
-    body = body.replace("{payment_link}", payment_link)
-    
-    # Send the email
-    await send_email(invoice["client_email"], subject, body)
-    
-    # Update invoice status to sent if it was draft
-    if invoice["status"] == "draft":
-        await db.invoices.update_one({"id": invoice_id}, {"$set": {"status": "sent"}})
+    values = {
+        "invoice_number": invoice["invoice_number"],
+        "total": f"{invoice['total']:.2f}",
+        "due_date": invoice.get("due_date") or "Upon Receipt",
+        "payment_link": payment_link
+    }
+    subject = render_email_template(template["subject"], values)
+    body = render_email_template(template["body_html"], values)
+    
+    if data.background:
+        email_queue.put_nowait((invoice, subject, body))
+        return KyberJSONResponse(
+            {"message": "Invoice queued for sending", "payment_link": payment_link},
+            status_code=202
+        )
     
+    await deliver_invoice_email(invoice, subject, body)
     return {"message": "Invoice sent successfully", "payment_link": payment_link}
 
 # ==================== EXPENSES ROUTES ====================
 
+# id -> name for categories and vendors. Names can't be edited, so an entry only goes stale
+# when its document is deleted: delete routes evict locally and the TTL covers other workers.
+category_name_cache: TTLCache = TTLCache(maxsize=1000, ttl=300)
+vendor_name_cache: TTLCache = TTLCache(maxsize=1000, ttl=300)
+
+async def lookup_name(collection, cache: TTLCache, doc_id: str) -> Optional[str]:
+    name = cache.get(doc_id)
+    if name is None:
+        doc = await collection.find_one({"id": doc_id}, {"_id": 0, "name": 1})
+        if doc:
+            name = cache[doc_id] = doc["name"]
+    return name
+
+async def resolve_category_and_vendor(data: ExpenseCreate) -> tuple:
+    """Category name and optional vendor name for an expense; cache misses are looked up concurrently"""
+    category_lookup = lookup_name(db.categories, category_name_cache, data.category_id)
+    if data.vendor_id:
+        category_name, vendor_name = await asyncio.gather(
+            category_lookup,
+            lookup_name(db.vendors, vendor_name_cache, data.vendor_id)
+        )
+    else:
+        category_name, vendor_name = await category_lookup, None
+    if category_name is None:
+        raise HTTPException(status_code=400, detail="Category not found")
+    return category_name, vendor_name
+
 @api_router.post("/expenses", response_model=ExpenseResponse)
 async def create_expense(data: ExpenseCreate, user: dict = Depends(require_accountant_or_admin)):
-    expense_id = str(uuid.uuid4())
-    
-    # Get category name
-    category = await db.categories.find_one({"id": data.category_id}, {"_id": 0})
-    if not category:
-        raise HTTPException(status_code=400, detail="Category not found")
+    expense_id = new_id()
     
-    # Get vendor name if provided
-    vendor_name = None
-    if data.vendor_id:
-        vendor = await db.vendors.find_one({"id": data.vendor_id}, {"_id": 0})
-        if vendor:
-            vendor_name = vendor["name"]
+    category_name, vendor_name = await resolve_category_and_vendor(data)
     
     expense_doc = {
         "id": expense_id,
         "description": data.description,
         "amount": data.amount,
         "category_id": data.category_id,
-        "category_name": category["name"],
+        "category_name": category_name,
         "vendor_id": data.vendor_id,
         "vendor_name": vendor_name,
         "date": data.date,
@@ -732,17 +1146,13 @@ async def create_expense(data: ExpenseCreate, user: dict = Depends(require_accou
     }
     
     await db.expenses.insert_one(expense_doc)
+    await rollup_expense_change(None, expense_doc)
     
     return ExpenseResponse(**{k: v for k, v in expense_doc.items() if k != "_id"})
 
 @api_router.post("/expenses/{expense_id}/upload-receipt")
 async def upload_receipt(expense_id: str, file: UploadFile = File(...), user: dict = Depends(require_accountant_or_admin)):
-    # Check file size (10MB limit)
-    contents = await file.read()
-    if len(contents) > 10 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File size exceeds 10MB limit")
-    
-    # Check file type
+    # Check file type before reading anything
     allowed_types = ["image/jpeg", "image/png", "image/gif", "image/webp"]
     if file.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail="Invalid file type. Allowed: JPEG, PNG, GIF, WEBP")
@@ -752,8 +1162,8 @@ async def upload_receipt(expense_id: str, file: UploadFile = File(...), user: di
     filename = f"{expense_id}.{file_ext}"
     filepath = UPLOAD_DIR / filename
     
-    async with aiofiles.open(filepath, "wb") as f:
-        await f.write(contents)
+    # 10MB limit, enforced while streaming
+    await save_upload(file, filepath, allowed_types, 10 * 1024 * 1024, "File size exceeds 10MB limit")
     
     # Update expense with receipt URL
     receipt_url = f"/api/uploads/{filename}"
@@ -761,10 +1171,23 @@ async def upload_receipt(expense_id: str, file: UploadFile = File(...), user: di
     
     return {"receipt_url": receipt_url}
 
-@api_router.get("/expenses", response_model=List[ExpenseResponse])
-async def list_expenses(user: dict = Depends(get_current_user)):
-    expenses = await db.expenses.find({}, {"_id": 0}).sort("date", -1).to_list(1000)
-    return [ExpenseResponse(**exp) for exp in expenses]
+# Only the fields the list response models expose; these lists page by offset (skip/limit)
+EXPENSE_LIST_PROJECTION = {
+    "_id": 0, "id": 1, "description": 1, "amount": 1, "category_id": 1, "category_name": 1,
+    "vendor_id": 1, "vendor_name": 1, "date": 1, "notes": 1, "receipt_url": 1,
+    "created_at": 1, "created_by": 1
+}
+CATEGORY_LIST_PROJECTION = {"_id": 0, "id": 1, "name": 1, "color": 1}
+VENDOR_LIST_PROJECTION = {"_id": 0, "id": 1, "name": 1, "email": 1, "phone": 1, "address": 1}
+
+@api_router.get("/expenses", responses={200: {"model": List[ExpenseResponse]}})
+async def list_expenses(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=1000),
+    user: dict = Depends(get_current_user)
+):
+    cursor = db.expenses.find({}, EXPENSE_LIST_PROJECTION).sort("date", -1).skip(skip).limit(limit).batch_size(200)
+    return json_array_response(cursor)
 
 @api_router.get("/expenses/{expense_id}", response_model=ExpenseResponse)
 async def get_expense(expense_id: str, user: dict = Depends(get_current_user)):
@@ -775,46 +1198,46 @@ async def get_expense(expense_id: str, user: dict = Depends(get_current_user)):
 
 @api_router.put("/expenses/{expense_id}", response_model=ExpenseResponse)
 async def update_expense(expense_id: str, data: ExpenseCreate, user: dict = Depends(require_accountant_or_admin)):
-    category = await db.categories.find_one({"id": data.category_id}, {"_id": 0})
-    if not category:
-        raise HTTPException(status_code=400, detail="Category not found")
-    
-    vendor_name = None
-    if data.vendor_id:
-        vendor = await db.vendors.find_one({"id": data.vendor_id}, {"_id": 0})
-        if vendor:
-            vendor_name = vendor["name"]
+    category_name, vendor_name = await resolve_category_and_vendor(data)
     
     update_doc = {
         "description": data.description,
         "amount": data.amount,
         "category_id": data.category_id,
-        "category_name": category["name"],
+        "category_name": category_name,
         "vendor_id": data.vendor_id,
         "vendor_name": vendor_name,
         "date": data.date,
         "notes": data.notes or ""
     }
     
-    result = await db.expenses.update_one({"id": expense_id}, {"$set": update_doc})
-    if result.matched_count == 0:
+    before = await db.expenses.find_one_and_update(
+        {"id": expense_id},
+        {"$set": update_doc},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
+    if not before:
         raise HTTPException(status_code=404, detail="Expense not found")
-    
-    expense = await db.expenses.find_one({"id": expense_id}, {"_id": 0})
+    expense = {**before, **update_doc}
+    await rollup_expense_change(before, expense)
     return ExpenseResponse(**expense)
 
 @api_router.delete("/expenses/{expense_id}")
 async def delete_expense(expense_id: str, user: dict = Depends(require_accountant_or_admin)):
-    result = await db.expenses.delete_one({"id": expense_id})
-    if result.deleted_count == 0:
+    expense = await db.expenses.find_one_and_delete(
+        {"id": expense_id}, projection={"_id": 0, "date": 1, "category_id": 1, "amount": 1}
+    )
+    if not expense:
         raise HTTPException(status_code=404, detail="Expense not found")
+    await rollup_expense_change(expense, None)
     return {"message": "Expense deleted successfully"}
 
 # ==================== CATEGORIES ROUTES ====================
 
 @api_router.post("/categories", response_model=CategoryResponse)
 async def create_category(data: CategoryCreate, user: dict = Depends(require_accountant_or_admin)):
-    category_id = str(uuid.uuid4())
+    category_id = new_id()
     category_doc = {
         "id": category_id,
         "name": data.name,
@@ -823,14 +1246,20 @@ async def create_category(data: CategoryCreate, user: dict = Depends(require_acc
     await db.categories.insert_one(category_doc)
     return CategoryResponse(**{k: v for k, v in category_doc.items() if k != "_id"})
 
-@api_router.get("/categories", response_model=List[CategoryResponse])
-async def list_categories(user: dict = Depends(get_current_user)):
-    categories = await db.categories.find({}, {"_id": 0}).to_list(1000)
-    return [CategoryResponse(**cat) for cat in categories]
+@api_router.get("/categories", responses={200: {"model": List[CategoryResponse]}})
+async def list_categories(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=1000),
+    user: dict = Depends(get_current_user)
+):
+    # _id order is insertion order, so pages stay stable
+    cursor = db.categories.find({}, CATEGORY_LIST_PROJECTION).sort("_id", 1).skip(skip).limit(limit).batch_size(200)
+    return json_array_response(cursor)
 
 @api_router.delete("/categories/{category_id}")
 async def delete_category(category_id: str, user: dict = Depends(require_accountant_or_admin)):
     result = await db.categories.delete_one({"id": category_id})
+    category_name_cache.pop(category_id, None)
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Category not found")
     return {"message": "Category deleted successfully"}
@@ -839,7 +1268,7 @@ async def delete_category(category_id: str, user: dict = Depends(require_account
 
 @api_router.post("/vendors", response_model=VendorResponse)
 async def create_vendor(data: VendorCreate, user: dict = Depends(require_accountant_or_admin)):
-    vendor_id = str(uuid.uuid4())
+    vendor_id = new_id()
     vendor_doc = {
         "id": vendor_id,
         "name": data.name,
@@ -850,14 +1279,19 @@ async def create_vendor(data: VendorCreate, user: dict = Depends(require_account
     await db.vendors.insert_one(vendor_doc)
     return VendorResponse(**{k: v for k, v in vendor_doc.items() if k != "_id"})
 
-@api_router.get("/vendors", response_model=List[VendorResponse])
-async def list_vendors(user: dict = Depends(get_current_user)):
-    vendors = await db.vendors.find({}, {"_id": 0}).to_list(1000)
-    return [VendorResponse(**v) for v in vendors]
+@api_router.get("/vendors", responses={200: {"model": List[VendorResponse]}})
+async def list_vendors(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=1000),
+    user: dict = Depends(get_current_user)
+):
+    cursor = db.vendors.find({}, VENDOR_LIST_PROJECTION).sort("_id", 1).skip(skip).limit(limit).batch_size(200)
+    return json_array_response(cursor)
 
 @api_router.delete("/vendors/{vendor_id}")
 async def delete_vendor(vendor_id: str, user: dict = Depends(require_accountant_or_admin)):
     result = await db.vendors.delete_one({"id": vendor_id})
+    vendor_name_cache.pop(vendor_id, None)
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Vendor not found")
     return {"message": "Vendor deleted successfully"}
@@ -867,28 +1301,29 @@ async def delete_vendor(vendor_id: str, user: dict = Depends(require_accountant_
 @api_router.post("/settings/smtp")
 async def save_smtp_settings(data: SMTPSettings, user: dict = Depends(require_admin)):
     encrypted_password = encrypt_data(data.password)
-    settings_doc = {
-        "type": "smtp",
-        "data": {
-            "host": data.host,
-            "port": data.port,
-            "username": data.username,
-            "password": encrypted_password,
-            "from_email": data.from_email,
-            "from_name": data.from_name,
-            "use_tls": data.use_tls
-        }
-    }
-    await db.settings.update_one({"type": "smtp"}, {"$set": settings_doc}, upsert=True)
-    return {"message": "SMTP settings saved successfully"}
+    saved = await write_setting("smtp", {
+        "host": data.host,
+        "port": data.port,
+        "username": data.username,
+        "password": encrypted_password,
+        "from_email": data.from_email,
+        "from_name": data.from_name,
+        "use_tls": data.use_tls
+    })
+    decrypt_data.cache_clear()
+    await smtp_pool.close()
+    # Echo the stored (sanitized) settings so clients needn't GET them again
+    return {"message": "SMTP settings saved successfully", **smtp_settings_view(saved)}
 
 @api_router.get("/settings/smtp")
 async def get_smtp_settings(user: dict = Depends(require_admin)):
     settings = await db.settings.find_one({"type": "smtp"}, {"_id": 0})
     if not settings:
         return {"configured": False}
-    
-    data = settings.get("data", {})
+    return smtp_settings_view(settings.get("data", {}))
+
+def smtp_settings_view(data: Dict[str, Any]) -> Dict[str, Any]:
+    """SMTP settings as shown to admins; the password never leaves the server"""
     return {
         "configured": True,
         "host": data.get("host"),
@@ -904,16 +1339,13 @@ async def save_paypal_settings(data: PayPalSettings, user: dict = Depends(requir
     encrypted_client_id = encrypt_data(data.client_id)
     encrypted_secret = encrypt_data(data.client_secret)
     
-    settings_doc = {
-        "type": "paypal",
-        "data": {
-            "client_id": encrypted_client_id,
-            "client_secret": encrypted_secret,
-            "sandbox": data.sandbox
-        }
-    }
-    await db.settings.update_one({"type": "paypal"}, {"$set": settings_doc}, upsert=True)
-    return {"message": "PayPal settings saved successfully"}
+    saved = await write_setting("paypal", {
+        "client_id": encrypted_client_id,
+        "client_secret": encrypted_secret,
+        "sandbox": data.sandbox
+    })
+    decrypt_data.cache_clear()
+    return {"message": "PayPal settings saved successfully", "configured": True, "sandbox": saved.get("sandbox", True)}
 
 @api_router.get("/settings/paypal")
 async def get_paypal_settings(user: dict = Depends(require_admin)):
@@ -928,7 +1360,8 @@ async def get_paypal_settings(user: dict = Depends(require_admin)):
 
 # ==================== EMAIL TEMPLATES ROUTES ====================
 
-DEFAULT_TEMPLATES = [
+# Seeded at startup; a tuple so nothing can mutate the shared defaults
+DEFAULT_TEMPLATES = (
     {
         "id": "default-professional",
         "name": "Professional Invoice",
@@ -1032,21 +1465,16 @@ DEFAULT_TEMPLATES = [
         """,
         "is_default": False
     }
-]
+)
 
-@api_router.get("/email-templates", response_model=List[EmailTemplateResponse])
+@api_router.get("/email-templates", responses={200: {"model": List[EmailTemplateResponse]}})
 async def list_email_templates(user: dict = Depends(get_current_user)):
-    templates = await db.email_templates.find({}, {"_id": 0}).to_list(100)
-    if not templates:
-        # Initialize with defaults
-        for t in DEFAULT_TEMPLATES:
-            await db.email_templates.insert_one(t)
-        templates = DEFAULT_TEMPLATES
-    return [EmailTemplateResponse(**t) for t in templates]
+    cursor = db.email_templates.find({}, {"_id": 0}).limit(100)
+    return json_array_response(cursor)
 
 @api_router.post("/email-templates", response_model=EmailTemplateResponse)
 async def create_email_template(data: EmailTemplateCreate, user: dict = Depends(require_admin)):
-    template_id = str(uuid.uuid4())
+    template_id = new_id()
     template_doc = {
         "id": template_id,
         "name": data.name,
@@ -1066,11 +1494,14 @@ async def update_email_template(template_id: str, data: EmailTemplateCreate, use
         "subject": data.subject,
         "body_html": data.body_html
     }
-    result = await db.email_templates.update_one({"id": template_id}, {"$set": update_doc})
-    if result.matched_count == 0:
+    template = await db.email_templates.find_one_and_update(
+        {"id": template_id},
+        {"$set": update_doc},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not template:
         raise HTTPException(status_code=404, detail="Template not found")
-    
-    template = await db.email_templates.find_one({"id": template_id}, {"_id": 0})
     return EmailTemplateResponse(**template)
 
 @api_router.post("/email-templates/{template_id}/set-default")
@@ -1083,8 +1514,8 @@ async def set_default_template(template_id: str, user: dict = Depends(require_ad
 
 @api_router.delete("/email-templates/{template_id}")
 async def delete_email_template(template_id: str, user: dict = Depends(require_admin)):
-    template = await db.email_templates.find_one({"id": template_id}, {"_id": 0})
-    if template and template.get("id", "").startswith("default-"):
+    # Seeded defaults are recognisable by id alone, so no lookup is needed before deleting
+    if template_id.startswith("default-"):
         raise HTTPException(status_code=400, detail="Cannot delete default templates")
     
     result = await db.email_templates.delete_one({"id": template_id})
@@ -1096,99 +1527,53 @@ async def delete_email_template(template_id: str, user: dict = Depends(require_a
 
 @api_router.post("/settings/branding")
 async def save_branding_settings(data: BrandingSettings, user: dict = Depends(require_admin)):
-    settings_doc = {
-        "type": "branding",
-        "data": {
-            "company_name": data.company_name,
-            "primary_color": data.primary_color,
-            "secondary_color": data.secondary_color,
-            "accent_color": data.accent_color,
-            "tagline": data.tagline or "",
-            "address": data.address or "",
-            "phone": data.phone or "",
-            "email": data.email or "",
-            "website": data.website or ""
-        }
-    }
-    await db.settings.update_one({"type": "branding"}, {"$set": settings_doc}, upsert=True)
-    return {"message": "Branding settings saved successfully"}
+    saved = await write_setting("branding", {
+        "company_name": data.company_name,
+        "primary_color": data.primary_color,
+        "secondary_color": data.secondary_color,
+        "accent_color": data.accent_color,
+        "tagline": data.tagline or "",
+        "address": data.address or "",
+        "phone": data.phone or "",
+        "email": data.email or "",
+        "website": data.website or ""
+    })
+    return {"message": "Branding settings saved successfully", **branding_settings_view(saved)}
+
+# Shown until an admin saves branding; stored fields override these key by key
+BRANDING_DEFAULTS = {
+    "company_name": "KyberBusiness",
+    "primary_color": "#06b6d4",
+    "secondary_color": "#d946ef",
+    "accent_color": "#10b981",
+    "tagline": "",
+    "address": "",
+    "phone": "",
+    "email": "",
+    "website": "",
+    "logo_url": None
+}
 
 @api_router.get("/settings/branding")
 async def get_branding_settings(user: dict = Depends(get_current_user)):
-    settings = await db.settings.find_one({"type": "branding"}, {"_id": 0})
-    if not settings:
-        return {
-            "configured": False,
-            "company_name": "KyberBusiness",
-            "primary_color": "#06b6d4",
-            "secondary_color": "#d946ef",
-            "accent_color": "#10b981",
-            "tagline": "",
-            "address": "",
-            "phone": "",
-            "email": "",
-            "website": "",
-            "logo_url": None
-        }
-    
-    data = settings.get("data", {})
-    return {
-        "configured": True,
-        "company_name": data.get("company_name", "KyberBusiness"),
-        "primary_color": data.get("primary_color", "#06b6d4"),
-        "secondary_color": data.get("secondary_color", "#d946ef"),
-        "accent_color": data.get("accent_color", "#10b981"),
-        "tagline": data.get("tagline", ""),
-        "address": data.get("address", ""),
-        "phone": data.get("phone", ""),
-        "email": data.get("email", ""),
-        "website": data.get("website", ""),
-        "logo_url": data.get("logo_url")
-    }
+    data = await get_setting("branding")
+    if data is None:
+        return {"configured": False, **BRANDING_DEFAULTS}
+    return branding_settings_view(data)
+
+def branding_settings_view(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {"configured": True, **BRANDING_DEFAULTS, **data}
 
 @api_router.get("/public/branding")
 async def get_public_branding():
     """Public endpoint for branding (used on public invoice pages)"""
-    settings = await db.settings.find_one({"type": "branding"}, {"_id": 0})
-    if not settings:
-        return {
-            "company_name": "KyberBusiness",
-            "primary_color": "#06b6d4",
-            "secondary_color": "#d946ef",
-            "accent_color": "#10b981",
-            "tagline": "",
-            "address": "",
-            "phone": "",
-            "email": "",
-            "website": "",
-            "logo_url": None
-        }
-    
-    data = settings.get("data", {})
-    logo_url = data.get("logo_url")
-    # Convert authenticated URL to public URL for public access
-    if logo_url and logo_url.startswith("/uploads/"):
-        logo_url = "/public" + logo_url
-    
-    return {
-        "company_name": data.get("company_name", "KyberBusiness"),
-        "primary_color": data.get("primary_color", "#06b6d4"),
-        "secondary_color": data.get("secondary_color", "#d946ef"),
-        "accent_color": data.get("accent_color", "#10b981"),
-        "tagline": data.get("tagline", ""),
-        "address": data.get("address", ""),
-        "phone": data.get("phone", ""),
-        "email": data.get("email", ""),
-        "website": data.get("website", ""),
-        "logo_url": logo_url
-    }
+    data = await get_setting("branding")
+    if data is None:
+        return BRANDING_DEFAULTS
+    return {**BRANDING_DEFAULTS, **data}
 
 @api_router.post("/settings/branding/logo")
 async def upload_logo(file: UploadFile = File(...), user: dict = Depends(require_admin)):
-    contents = await file.read()
-    if len(contents) > 5 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="Logo must be less than 5MB")
-    
     allowed_types = ["image/jpeg", "image/png", "image/gif", "image/webp", "image/svg+xml"]
     if file.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail="Invalid file type. Allowed: JPEG, PNG, GIF, WEBP, SVG")
@@ -1197,11 +1582,12 @@ async def upload_logo(file: UploadFile = File(...), user: dict = Depends(require
     filename = f"company_logo.{file_ext}"
     filepath = UPLOAD_DIR / filename
     
-    async with aiofiles.open(filepath, "wb") as f:
-        await f.write(contents)
+    await save_upload(file, filepath, allowed_types, 5 * 1024 * 1024, "Logo must be less than 5MB")
+    public_etag_cache.clear()
     
-    # Store URL without /api prefix since frontend adds it
-    logo_url = f"/uploads/{filename}"
+    # Store the public URL (without /api prefix since frontend adds it); readers pass it through.
+    # The file name never changes, so the mtime versions the URL past cached copies of old logos.
+    logo_url = f"/public/uploads/{filename}?v={filepath.stat().st_mtime_ns:x}"
     
     # Update branding settings with logo URL
     await db.settings.update_one(
@@ -1209,6 +1595,7 @@ async def upload_logo(file: UploadFile = File(...), user: dict = Depends(require
         {"$set": {"data.logo_url": logo_url}},
         upsert=True
     )
+    invalidate_setting("branding")
     
     return {"logo_url": logo_url}
 
@@ -1219,17 +1606,121 @@ async def delete_logo(user: dict = Depends(require_admin)):
         {"type": "branding"},
         {"$unset": {"data.logo_url": ""}}
     )
-    
-    # Delete logo files
-    import glob
-    for f in glob.glob(str(UPLOAD_DIR / "company_logo.*")):
-        try:
-            os.remove(f)
-        except:
-            pass
+    invalidate_setting("branding")
+    
+    # Delete logo files (one directory scan, no glob pattern matching)
+    with os.scandir(UPLOAD_DIR) as entries:
+        for entry in entries:
+            if entry.name.startswith("company_logo."):
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+    public_etag_cache.clear()
     
     return {"message": "Logo deleted successfully"}
 
+# ==================== REPORT ROLLUPS ====================
+
+# Per-day totals maintained on every write that can change a report, so summaries read a few
+# rows per day instead of scanning invoices/expenses:
+#   daily_revenue   {_id: "YYYY-MM-DD", revenue, invoice_count}   paid invoices by paid_at day
+#   daily_expenses  {day, category_id, category_name, amount, expense_count}
+
+def revenue_contribution(invoice: Optional[dict]) -> Optional[tuple]:
+    if invoice and invoice.get("status") == "paid" and invoice.get("paid_at"):
+        return invoice["paid_at"][:10], invoice.get("total", 0)
+    return None
+
+def expense_contribution(expense: Optional[dict]) -> Optional[tuple]:
+    if expense and expense.get("date"):
+        return expense["date"][:10], expense.get("category_id"), expense.get("category_name"), expense.get("amount", 0)
+    return None
+
+async def rollup_invoice_change(before: Optional[dict], after: Optional[dict]):
+    """Move an invoice's revenue between daily rollups (before/after are None on create/delete)"""
+    old, new = revenue_contribution(before), revenue_contribution(after)
+    if old == new:
+        return
+    ops = []
+    if old:
+        ops.append(UpdateOne({"_id": old[0]}, {"$inc": {"revenue": -old[1], "invoice_count": -1}}, upsert=True))
+    if new:
+        ops.append(UpdateOne({"_id": new[0]}, {"$inc": {"revenue": new[1], "invoice_count": 1}}, upsert=True))
+    await db.daily_revenue.bulk_write(ops)
+
+async def rollup_expense_change(before: Optional[dict], after: Optional[dict]):
+    """Move an expense's amount between daily rollups (before/after are None on create/delete)"""
+    old, new = expense_contribution(before), expense_contribution(after)
+    if old == new:
+        return
+    ops = []
+    if old:
+        day, category_id, _, amount = old
+        ops.append(UpdateOne(
+            {"day": day, "category_id": category_id},
+            {"$inc": {"amount": -amount, "expense_count": -1}},
+            upsert=True
+        ))
+    if new:
+        day, category_id, category_name, amount = new
+        ops.append(UpdateOne(
+            {"day": day, "category_id": category_id},
+            {"$inc": {"amount": amount, "expense_count": 1}, "$set": {"category_name": category_name}},
+            upsert=True
+        ))
+    await db.daily_expenses.bulk_write(ops)
+
+ROLLUP_MIGRATION_ID = "report_rollups"
+
+async def mark_rollups_backfilled():
+    await db.migrations.update_one(
+        {"_id": ROLLUP_MIGRATION_ID},
+        {"$set": {"completed_at": datetime.now(timezone.utc).isoformat()}},
+        upsert=True
+    )
+
+async def backfill_report_rollups(force: bool = False) -> bool:
+    """Build the rollups from the raw collections, on a database that predates them.
+
+    Run as a one-off command with the app stopped (`python server.py backfill-rollups`): the
+    $merge replaces whole rows, so $inc traffic from live workers would be overwritten.
+    The marker is only written once both merges succeed, so a failed run can be rerun;
+    force clears and recomputes rollups that have drifted from the raw collections.
+    """
+    if not force and await db.migrations.find_one({"_id": ROLLUP_MIGRATION_ID}):
+        return False
+    # $merge on day/category_id needs this index, and the app may never have started yet
+    await db.daily_expenses.create_index([("day", 1), ("category_id", 1)], unique=True)
+    if force:
+        await asyncio.gather(db.daily_revenue.delete_many({}), db.daily_expenses.delete_many({}))
+    await db.invoices.aggregate([
+        {"$match": {"status": "paid", "paid_at": {"$type": "string"}}},
+        {"$group": {
+            "_id": {"$substrBytes": ["$paid_at", 0, 10]},  # YYYY-MM-DD
+            "revenue": {"$sum": "$total"},
+            "invoice_count": {"$sum": 1}
+        }},
+        {"$merge": {"into": "daily_revenue", "whenMatched": "replace"}}
+    ]).to_list(None)
+    await db.expenses.aggregate([
+        {"$match": {"date": {"$type": "string"}, "category_id": {"$type": "string"}}},
+        {"$sort": {"date": 1, "created_at": 1}},  # so $last is the most recent name
+        {"$group": {
+            "_id": {"day": {"$substrBytes": ["$date", 0, 10]}, "category_id": "$category_id"},
+            "category_name": {"$last": "$category_name"},
+            "amount": {"$sum": "$amount"},
+            "expense_count": {"$sum": 1}
+        }},
+        {"$project": {
+            "_id": 0, "day": "$_id.day", "category_id": "$_id.category_id",
+            "category_name": 1, "amount": 1, "expense_count": 1
+        }},
+        {"$merge": {"into": "daily_expenses", "on": ["day", "category_id"], "whenMatched": "replace"}}
+    ]).to_list(None)
+    await mark_rollups_backfilled()
+    return True
+
 # ==================== REPORTS ROUTES ====================
 
 @api_router.get("/reports/summary")
@@ -1238,94 +1729,129 @@ async def get_report_summary(
     end_date: str = Query(...),
     user: dict = Depends(get_current_user)
 ):
-    # Revenue from paid invoices
-    invoices = await db.invoices.find({
-        "status": "paid",
-        "paid_at": {"$gte": start_date, "$lte": end_date}
-    }, {"_id": 0}).to_list(10000)
-    
-    total_revenue = sum(inv.get("total", 0) for inv in invoices)
-    
-    # Expenses
-    expenses = await db.expenses.find({
-        "date": {"$gte": start_date, "$lte": end_date}
-    }, {"_id": 0}).to_list(10000)
-    
-    total_expenses = sum(exp.get("amount", 0) for exp in expenses)
-    
-    # Profit/Loss
-    profit_loss = total_revenue - total_expenses
+    # Read the daily rollups; whole days, so the end date is inclusive
+    start_day, end_day = start_date[:10], end_date[:10]
+    revenue_pipeline = [
+        {"$match": {"_id": {"$gte": start_day, "$lte": end_day}}},
+        {"$group": {
+            "_id": {"$substrBytes": ["$_id", 0, 7]},  # YYYY-MM
+            "revenue": {"$sum": "$revenue"},
+            "count": {"$sum": "$invoice_count"}
+        }}
+    ]
+    # Group by category id first, then join the (few) grouped rows to categories so the
+    # breakdown uses current names; the stored name only covers deleted categories
+    expense_pipeline = [
+        {"$match": {"day": {"$gte": start_day, "$lte": end_day}}},
+        {"$sort": {"day": 1}},  # so $last is the most recent name
+        {"$group": {
+            "_id": {"month": {"$substrBytes": ["$day", 0, 7]}, "category_id": "$category_id"},
+            "stored_name": {"$last": "$category_name"},
+            "amount": {"$sum": "$amount"},
+            "count": {"$sum": "$expense_count"}
+        }},
+        {"$match": {"count": {"$gt": 0}}},
+        {"$lookup": {"from": "categories", "localField": "_id.category_id", "foreignField": "id", "as": "category"}},
+        {"$project": {
+            "_id": {
+                "month": "$_id.month",
+                "category": {"$ifNull": [
+                    {"$arrayElemAt": ["$category.name", 0]},
+                    {"$ifNull": ["$stored_name", "Uncategorized"]}
+                ]}
+            },
+            "amount": 1,
+            "count": 1
+        }},
+        {"$sort": {"_id.category": 1}}
+    ]
+    invoice_rows, expense_rows = await asyncio.gather(
+        db.daily_revenue.aggregate(revenue_pipeline).to_list(None),
+        db.daily_expenses.aggregate(expense_pipeline).to_list(None)
+    )
     
-    # Monthly breakdown for charts
+    # Monthly breakdown for charts, plus totals
     monthly_data = {}
-    for inv in invoices:
-        month = inv.get("paid_at", "")[:7]  # YYYY-MM
-        if month not in monthly_data:
-            monthly_data[month] = {"revenue": 0, "expenses": 0}
-        monthly_data[month]["revenue"] += inv.get("total", 0)
-    
-    for exp in expenses:
-        month = exp.get("date", "")[:7]
-        if month not in monthly_data:
-            monthly_data[month] = {"revenue": 0, "expenses": 0}
-        monthly_data[month]["expenses"] += exp.get("amount", 0)
+    total_revenue = invoice_count = 0
+    for row in invoice_rows:
+        if not row["count"]:
+            continue  # every invoice that month was unpaid or deleted again
+        monthly_data.setdefault(row["_id"], {"revenue": 0, "expenses": 0})["revenue"] += row["revenue"]
+        total_revenue += row["revenue"]
+        invoice_count += row["count"]
+    
+    # Expense breakdown by category
+    category_breakdown = {}
+    total_expenses = expense_count = 0
+    for row in expense_rows:
+        month, category = row["_id"]["month"], row["_id"]["category"]
+        monthly_data.setdefault(month, {"revenue": 0, "expenses": 0})["expenses"] += row["amount"]
+        category_breakdown[category] = category_breakdown.get(category, 0) + row["amount"]
+        total_expenses += row["amount"]
+        expense_count += row["count"]
     
     chart_data = [
         {"month": k, "revenue": v["revenue"], "expenses": v["expenses"]}
         for k, v in sorted(monthly_data.items())
     ]
-    
-    # Expense breakdown by category
-    category_breakdown = {}
-    for exp in expenses:
-        cat = exp.get("category_name", "Uncategorized")
-        if cat not in category_breakdown:
-            category_breakdown[cat] = 0
-        category_breakdown[cat] += exp.get("amount", 0)
-    
     category_data = [{"name": k, "value": v} for k, v in category_breakdown.items()]
     
     return {
         "total_revenue": total_revenue,
         "total_expenses": total_expenses,
-        "profit_loss": profit_loss,
-        "invoice_count": len(invoices),
-        "expense_count": len(expenses),
+        "profit_loss": total_revenue - total_expenses,
+        "invoice_count": invoice_count,
+        "expense_count": expense_count,
         "chart_data": chart_data,
         "category_breakdown": category_data
     }
 
+# The dashboard's recent lists only render these fields; skip line items, notes etc.
+DASHBOARD_INVOICE_PROJECTION = {"_id": 0, "id": 1, "invoice_number": 1, "client_name": 1, "status": 1, "total": 1, "created_at": 1}
+DASHBOARD_EXPENSE_PROJECTION = {"_id": 0, "id": 1, "description": 1, "category_name": 1, "amount": 1, "date": 1}
+
+def facet_value(rows: list, field: str):
+    """Value from a single-row $facet branch ($count/$group emit no row when nothing matched)"""
+    return rows[0][field] if rows else 0
+
 @api_router.get("/reports/dashboard")
 async def get_dashboard_data(user: dict = Depends(get_current_user)):
-    # Get counts and recent items
-    invoice_count = await db.invoices.count_documents({})
-    quote_count = await db.quotes.count_documents({})
-    expense_count = await db.expenses.count_documents({})
-    
-    # Pending invoices
-    pending_invoices = await db.invoices.find(
-        {"status": {"$in": ["draft", "sent"]}}, 
-        {"_id": 0}
-    ).sort("created_at", -1).limit(5).to_list(5)
-    
-    # Recent expenses
-    recent_expenses = await db.expenses.find({}, {"_id": 0}).sort("date", -1).limit(5).to_list(5)
-    
-    # Total outstanding
-    outstanding_invoices = await db.invoices.find(
-        {"status": {"$in": ["draft", "sent", "overdue"]}},
-        {"_id": 0}
-    ).to_list(1000)
-    total_outstanding = sum(inv.get("total", 0) for inv in outstanding_invoices)
-    
-    # This month's revenue
-    now = datetime.now(timezone.utc)
-    month_start = now.replace(day=1).isoformat()[:10]
-    paid_this_month = await db.invoices.find({
-        "status": "paid",
-        "paid_at": {"$gte": month_start}
-    }, {"_id": 0}).to_list(1000)
-    revenue_this_month = sum(inv.get("total", 0) for inv in paid_this_month)
+    month_start = time.strftime("%Y-%m-01", time.gmtime())  # UTC, as before
+    
+    # One $facet per collection: counts, recent items and totals in a single round trip each
+    invoice_facets = [{"$facet": {
+        "count": [{"$count": "n"}],
+        "pending": [
+            {"$match": {"status": {"$in": ["draft", "sent"]}}},
+            {"$sort": {"created_at": -1}},
+            {"$limit": 5},
+            {"$project": DASHBOARD_INVOICE_PROJECTION}
+        ],
+        "outstanding": [
+            {"$match": {"status": {"$in": ["draft", "sent", "overdue"]}}},
+            {"$group": {"_id": None, "total": {"$sum": "$total"}}}
+        ],
+        "month_revenue": [
+            {"$match": {"status": "paid", "paid_at": {"$gte": month_start}}},
+            {"$group": {"_id": None, "total": {"$sum": "$total"}}}
+        ]
+    }}]
+    expense_facets = [{"$facet": {
+        "count": [{"$count": "n"}],
+        "recent": [{"$sort": {"date": -1}}, {"$limit": 5}, {"$project": DASHBOARD_EXPENSE_PROJECTION}]
+    }}]
+    invoice_stats, expense_stats, quote_count = await asyncio.gather(
+        db.invoices.aggregate(invoice_facets).next(),
+        db.expenses.aggregate(expense_facets).next(),
+        db.quotes.count_documents({})
+    )
+    
+    invoice_count = facet_value(invoice_stats["count"], "n")
+    expense_count = facet_value(expense_stats["count"], "n")
+    pending_invoices = invoice_stats["pending"]
+    recent_expenses = expense_stats["recent"]
+    total_outstanding = facet_value(invoice_stats["outstanding"], "total")
+    revenue_this_month = facet_value(invoice_stats["month_revenue"], "total")
     
     return {
         "invoice_count": invoice_count,
@@ -1344,36 +1870,120 @@ from fastapi.responses import FileResponse
 @api_router.get("/uploads/{filename}")
 async def serve_upload(filename: str, user: dict = Depends(get_current_user)):
     filepath = UPLOAD_DIR / filename
-    if not filepath.exists():
+    # One stat for both the existence check and FileResponse's headers
+    try:
+        stat_result = filepath.stat()
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(filepath)
+    return FileResponse(filepath, stat_result=stat_result)
+
+# Public assets are fetched on every public invoice view but change rarely; browsers revalidate
+# with If-None-Match once max-age runs out. Stored logo URLs carry a ?v= version, so a new
+# upload is a new URL and never waits out a cached copy.
+PUBLIC_UPLOAD_CACHE_CONTROL = "public, max-age=86400, stale-while-revalidate=3600"
+# filename -> ETag, so revalidations (the common case) are answered without a stat. The logo
+# routes evict it; the short TTL covers other workers. Full responses always stat afresh.
+public_etag_cache: TTLCache = TTLCache(maxsize=32, ttl=10)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
 
 @api_router.get("/public/uploads/{filename}")
-async def serve_public_upload(filename: str):
+async def serve_public_upload(filename: str, request: Request):
     """Public endpoint for serving logos and other public assets"""
     # Only allow company logo files to be served publicly
     if not filename.startswith("company_logo"):
         raise HTTPException(status_code=403, detail="Access denied")
+    etag = public_etag_cache.get(filename)
+    if etag is not None and etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": PUBLIC_UPLOAD_CACHE_CONTROL})
+    
     filepath = UPLOAD_DIR / filename
-    if not filepath.exists():
+    try:
+        stat_result = filepath.stat()
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(filepath)
+    
+    # Uploads replace the file atomically, so mtime+size identifies its content
+    etag = public_etag_cache[filename] = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+    headers = {"ETag": etag, "Cache-Control": PUBLIC_UPLOAD_CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(filepath, headers=headers, stat_result=stat_result)
 
 # ==================== HEALTH CHECK ====================
 
+# Probes hit this constantly; the body never changes, so it's encoded once
+HEALTH_BODY = b'{"status":"healthy"}'
+
 @api_router.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
+    return Response(content=HEALTH_BODY, media_type="application/json")
 
 # Include the router
 app.include_router(api_router)
 
+# Request body caps for the upload routes: the file limit plus room for multipart framing
+UPLOAD_BODY_LIMITS = (
+    (re.compile(r"/api/settings/branding/logo"), 5 * 1024 * 1024 + 64 * 1024),
+    (re.compile(r"/api/expenses/[^/]+/upload-receipt"), 10 * 1024 * 1024 + 64 * 1024),
+)
+
+class ContentSizeLimitMiddleware:
+    """Pure ASGI middleware rejecting oversized upload bodies with 413 before they're buffered.
+    
+    A declared Content-Length over the limit is refused before any of the body is read;
+    chunked bodies are counted as they stream in and cut off once they pass the limit.
+    """
+    
+    def __init__(self, app, limits: tuple):
+        self.app = app
+        self.limits = limits
+    
+    async def __call__(self, scope, receive, send):
+        max_size = None
+        if scope["type"] == "http":
+            max_size = next((size for pattern, size in self.limits if pattern.fullmatch(scope["path"])), None)
+        if max_size is None:
+            await self.app(scope, receive, send)
+            return
+        
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_size:
+            response = KyberJSONResponse({"detail": "Request body too large"}, status_code=413)
+            await response(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_size:
+                    # Raised inside the route's body read, so FastAPI renders it as a 413
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+# Added before CORS so CORS stays outermost and 413s still carry its headers
+app.add_middleware(ContentSizeLimitMiddleware, limits=UPLOAD_BODY_LIMITS)
+
+# Tolerate spaces and trailing commas in the env var
+CORS_ORIGINS = [origin.strip() for origin in os.environ.get('CORS_ORIGINS', '*').split(',') if origin.strip()]
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+    allow_origins=CORS_ORIGINS,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=86400,  # let browsers cache preflights for a day instead of 10 minutes
 )
 
 # Configure logging
@@ -1383,6 +1993,79 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def startup_db_client():
+    # Fail fast if Mongo is unreachable and start filling the pool before traffic arrives
+    await db.command("ping")
+    
+    # Back every id/email/token/type lookup and created_at sort with an index (no-ops if present)
+    await db.users.create_index("id", unique=True)
+    await db.users.create_index("email", unique=True)
+    await db.users.create_index("verification_token", sparse=True)
+    await db.users.create_index([("created_at", 1)])
+    await db.quotes.create_index("id", unique=True)
+    await db.quotes.create_index([("created_at", -1)])
+    await db.invoices.create_index("id", unique=True)
+    await db.invoices.create_index([("created_at", -1)])
+    # Paid invoices by paid_at, for the rollup backfill ($facet branches can't use indexes)
+    await db.invoices.create_index([("status", 1), ("paid_at", 1)])
+    await db.expenses.create_index("id", unique=True)
+    await db.expenses.create_index([("date", -1)])
+    await db.categories.create_index("id", unique=True)
+    await db.vendors.create_index("id", unique=True)
+    await db.email_templates.create_index("id", unique=True)
+    await db.settings.create_index("type", unique=True)
+    await db.daily_expenses.create_index([("day", 1), ("category_id", 1)], unique=True)
+    
+    # Seed the default email templates in one round trip; $setOnInsert leaves edited copies alone
+    await db.email_templates.bulk_write(
+        [UpdateOne({"id": t["id"]}, {"$setOnInsert": t}, upsert=True) for t in DEFAULT_TEMPLATES],
+        ordered=False
+    )
+    if not await db.migrations.find_one({"_id": ROLLUP_MIGRATION_ID}):
+        if await db.invoices.find_one({}, {"_id": 1}) or await db.expenses.find_one({}, {"_id": 1}):
+            logging.warning("Report rollups have not been backfilled; stop the app and run `python server.py backfill-rollups`")
+        else:
+            # Nothing to backfill on an empty database; every write keeps the rollups current
+            await mark_rollups_backfilled()
+    # Logos uploaded before the public URL was stored directly
+    await db.settings.update_one(
+        {"type": "branding", "data.logo_url": {"$regex": "^/uploads/"}},
+        [{"$set": {"data.logo_url": {"$concat": ["/public", "$data.logo_url"]}}}]
+    )
+    
+    app.state.email_worker = asyncio.create_task(email_worker())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    app.state.email_worker.cancel()
+    await smtp_pool.close()
+    password_executor.shutdown(wait=False)
+
+if __name__ == "__main__":
+    import sys
+    import uvicorn
+    
+    if sys.argv[1:2] == ["backfill-rollups"]:
+        # --force rebuilds rollups that were already backfilled, e.g. after they drifted
+        ran = asyncio.run(backfill_report_rollups(force="--force" in sys.argv[2:]))
+        print("Report rollups backfilled" if ran else "Report rollups were already backfilled")
+        sys.exit(0)
+    
+    # uvloop + httptools instead of the default asyncio loop and h11 parser.
+    # One worker by default: user_cache, settings_cache, the email queue/worker and the public
+    # ETag cache live in-process, so extra workers (WEB_CONCURRENCY) serve stale data until
+    # those caches get shared invalidation.
+    uvicorn.run(
+        "server:app",
+        host="0.0.0.0",
+        port=int(os.environ.get("PORT", 8001)),
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.environ.get("WEB_CONCURRENCY", 1)),
+        backlog=2048
+    )
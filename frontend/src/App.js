@@ -5,7 +5,7 @@ import { AuthProvider, useAuth } from "./context/AuthContext";
 import { ThemeProvider } from "./context/ThemeContext";
 
 // Pages
-import { LoginPage, RegisterPage } from "./pages/AuthPages";
+import { LoginPage, RegisterPage, VerifyEmailPage } from "./pages/AuthPages";
 import { DashboardPage } from "./pages/DashboardPage";
 import { QuotesPage, CreateQuotePage, EditQuotePage, ViewQuotePage } from "./pages/QuotesPages";
 import { InvoicesPage, CreateInvoicePage, EditInvoicePage, ViewInvoicePage } from "./pages/InvoicesPages";
@@ -86,6 +86,9 @@ function AppRoutes() {
         }
       />
 
+      {/* Email verification link target (works signed in or out) */}
+      <Route path="/verify-email" element={<VerifyEmailPage />} />
+
       {/* Public Invoice Payment Page */}
       <Route path="/pay/:id" element={<PublicInvoicePage />} />
 
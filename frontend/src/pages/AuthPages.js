@@ -1,5 +1,5 @@
-import React, { useState } from "react";
-import { useNavigate, Link } from "react-router-dom";
+import React, { useState, useEffect, useRef } from "react";
+import { useNavigate, useSearchParams, Link } from "react-router-dom";
 import { useAuth } from "../context/AuthContext";
 import { KyberLogo } from "../components/KyberLogo";
 import { Button } from "../components/ui/button";
@@ -7,7 +7,8 @@ import { Input } from "../components/ui/input";
 import { Label } from "../components/ui/label";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "../components/ui/card";
 import { toast } from "sonner";
-import { Loader2, Mail, Lock, ArrowRight } from "lucide-react";
+import { API_URL } from "../lib/utils";
+import { Loader2, Mail, Lock, ArrowRight, CheckCircle, AlertCircle } from "lucide-react";
 
 export const LoginPage = () => {
   const [email, setEmail] = useState("");
@@ -285,3 +286,51 @@ export const RegisterPage = () => {
     </div>
   );
 };
+
+export const VerifyEmailPage = () => {
+  const [searchParams] = useSearchParams();
+  const token = searchParams.get("token");
+  const [status, setStatus] = useState(token ? "verifying" : "error");
+  const [message, setMessage] = useState(token ? "" : "This verification link is missing its token.");
+
+  // StrictMode runs effects twice in development; send the token only once
+  const requested = useRef(false);
+
+  useEffect(() => {
+    if (!token || requested.current) return;
+    requested.current = true;
+    fetch(`${API_URL}/auth/verify-email?token=${encodeURIComponent(token)}`, { method: "POST" })
+      .then(async (response) => {
+        const data = await response.json().catch(() => ({}));
+        if (!response.ok) throw new Error(data.detail || "Verification failed");
+        setStatus("verified");
+        setMessage(data.message || "Email verified successfully");
+      })
+      .catch((err) => {
+        setStatus("error");
+        setMessage(err.message);
+      });
+  }, [token]);
+
+  return (
+    <div className="min-h-screen flex items-center justify-center bg-background p-4">
+      <Card className="w-full max-w-md rounded-3xl border-white/10 bg-card/50 backdrop-blur-xl shadow-2xl">
+        <CardHeader className="text-center space-y-4 pb-2">
+          <div className="flex justify-center">
+            <KyberLogo size={60} />
+          </div>
+          <CardTitle className="text-2xl font-heading gradient-text">Email Verification</CardTitle>
+        </CardHeader>
+        <CardContent className="pt-4 text-center space-y-4" data-testid="verify-email-status">
+          {status === "verifying" && <Loader2 className="w-10 h-10 animate-spin text-primary mx-auto" />}
+          {status === "verified" && <CheckCircle className="w-10 h-10 text-emerald-500 mx-auto" />}
+          {status === "error" && <AlertCircle className="w-10 h-10 text-destructive mx-auto" />}
+          <p className="text-muted-foreground">{status === "verifying" ? "Verifying your email..." : message}</p>
+          <Link to="/login" className="text-primary hover:text-primary/80 font-medium transition-colors">
+            Go to sign in
+          </Link>
+        </CardContent>
+      </Card>
+    </div>
+  );
+};